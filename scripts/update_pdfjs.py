@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""Refresh the PDF.js files vendored under vendor/pdfjs.
+
+Run this after bumping scripts/pdfjs_version.txt and commit the result:
+
+    python scripts/update_pdfjs.py
+
+With vendor/pdfjs committed, build.py copies the files from there instead of
+installing pdfjs-dist with npm.
+"""
+
+from __future__ import annotations
+
+import shutil
+
+from build import PDFJS_VERSION, ROOT, VENDOR_PDFJS_DIR, install_pdfjs
+
+
+def main() -> None:
+    sources = install_pdfjs(PDFJS_VERSION)
+
+    if VENDOR_PDFJS_DIR.exists():
+        shutil.rmtree(VENDOR_PDFJS_DIR)
+    VENDOR_PDFJS_DIR.mkdir(parents=True)
+
+    for src in sources:
+        shutil.copyfile(src, VENDOR_PDFJS_DIR / src.name)
+    (VENDOR_PDFJS_DIR / "VERSION").write_text(PDFJS_VERSION + "\n", encoding="utf-8")
+
+    print(f"Vendored pdfjs-dist {PDFJS_VERSION} into {VENDOR_PDFJS_DIR.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,467 @@
+import * as pdfjsLib from './pdfjs/pdf.min.mjs';
+import * as pdfjsViewer from './pdfjs/pdf_viewer.mjs';
+
+let PDF_URL = null;
+let PDF_PAGES = 0;
+
+const pan = document.getElementById('pan');
+const stage = document.getElementById('stage');
+const canvas = document.getElementById('pdfCanvas');
+let textLayerDiv = document.getElementById('textLayer');
+let annotationLayerDiv = document.getElementById('annotationLayer');
+const prevBtn = document.getElementById('prevBtn');
+const nextBtn = document.getElementById('nextBtn');
+const status = document.getElementById('status');
+
+function setStatus(msg) { status.textContent = msg; status.style.display = msg ? 'block' : 'none'; }
+function setError(msg, err) { setStatus(msg); console.error(msg, err); }
+function clamp(n, lo, hi) { return Math.max(lo, Math.min(hi, n)); }
+
+let pdfDoc = null;
+// Shared by every page's annotation layer; bound to the document in loadPdf().
+// It reports named actions on its event bus, so it needs one even though
+// nothing here listens.
+const linkService = new pdfjsViewer.PDFLinkService({ eventBus: new pdfjsViewer.EventBus() });
+// PDFLinkService navigates through a PDFViewer. This viewer shows one page
+// at a time, so map the calls internal links and named actions make onto
+// renderPage().
+linkService.setViewer({
+  get currentPageNumber() { return pageNumber; },
+  set currentPageNumber(n) { if (n !== pageNumber) renderPage(n); },
+  get pagesRotation() { return 0; },
+  get isInPresentationMode() { return false; },
+  pageLabelToPageNumber() { return null; },
+  scrollPageIntoView({ pageNumber: n }) { if (n !== pageNumber) renderPage(n); },
+  nextPage() { next(); },
+  previousPage() { prev(); },
+});
+let pageNumber = 1;
+let baseScale = 1;
+let zoom = 1;
+let renderToken = 0;
+let renderTask = null;
+let refineTimer = null;
+let zoomSettleTimer = null;
+let shown = null;
+
+function setNavState() {
+  const total = (pdfDoc && pdfDoc.numPages) ? pdfDoc.numPages : (PDF_PAGES ? PDF_PAGES : 0);
+  prevBtn.setAttribute('aria-disabled', String(pageNumber <= 1));
+  nextBtn.setAttribute('aria-disabled', String(total && pageNumber >= total));
+}
+
+// The paddings, gutter and fit scale are :root custom properties that only
+// change with the viewport (safe-area insets, the 720px breakpoint). Read
+// them once and again only after a resize, not on every page turn.
+let layoutVars = null;
+window.addEventListener('resize', () => { layoutVars = null; }, { passive: true });
+function getLayoutVars() {
+  if (layoutVars) return layoutVars;
+  const cs = getComputedStyle(document.documentElement);
+  const read = (name, fallback) => {
+    const v = Number.parseFloat(cs.getPropertyValue(name));
+    return Number.isFinite(v) ? v : fallback;
+  };
+  layoutVars = {
+    pTop: read('--pad-top', 0),
+    pRight: read('--pad-right', 0),
+    pBottom: read('--pad-bottom', 0),
+    pLeft: read('--pad-left', 0),
+    gut: read('--gutter', 0),
+    fit: read('--fit-scale', 1),
+  };
+  return layoutVars;
+}
+
+function computeBaseScale(viewportW, viewportH) {
+  const { pTop, pRight, pBottom, pLeft, gut, fit } = getLayoutVars();
+  const margin = 4;
+  const availW = Math.max(1, window.innerWidth - pLeft - pRight - (2 * gut) - margin);
+  const availH = Math.max(1, window.innerHeight - pTop - pBottom - margin);
+  baseScale = Math.min(availW / viewportW, availH / viewportH) * fit;
+  baseScale = clamp(baseScale, 0.01, 10);
+}
+
+function applyScale() {
+  const s = baseScale * zoom;
+  stage.style.transform = `scale(${s})`;
+  pan.classList.toggle('is-zoomed', zoom > 1.01);
+}
+
+// Zooming only moves the CSS transform. Once the gesture has been quiet
+// for ZOOM_SETTLE_MS, redraw the canvas once at the zoomed resolution.
+const ZOOM_SETTLE_MS = 400;
+function onZoom() {
+  applyScale();
+  if (refineTimer) { clearTimeout(refineTimer); refineTimer = null; }
+  if (zoomSettleTimer) clearTimeout(zoomSettleTimer);
+  zoomSettleTimer = setTimeout(refineShown, ZOOM_SETTLE_MS);
+}
+
+function refineShown() {
+  zoomSettleTimer = null;
+  const view = shown;
+  if (!view || view.token !== renderToken) return;
+  const scale = getQualityScaleForCurrentView(view.viewport);
+  if (scale <= view.scale + 0.05) return;
+  refineCanvas(view.page, view.viewport, scale, view.token)
+    .then((done) => {
+      if (!done) return;
+      view.scale = scale;
+      if (scale === view.maxScale) cachePage(view.num, scale, scale);
+    })
+    .catch(() => {});
+}
+
+function recenter() {
+  const maxX = Math.max(0, pan.scrollWidth - pan.clientWidth);
+  const maxY = Math.max(0, pan.scrollHeight - pan.clientHeight);
+  pan.scrollLeft = maxX / 2;
+  pan.scrollTop = maxY / 2;
+}
+
+function next() { if (pdfDoc && pageNumber < pdfDoc.numPages) renderPage(pageNumber + 1); }
+function prev() { if (pdfDoc && pageNumber > 1) renderPage(pageNumber - 1); }
+prevBtn.addEventListener('click', prev);
+nextBtn.addEventListener('click', next);
+window.addEventListener('keydown', (e) => {
+  if (e.key === 'ArrowRight') next();
+  if (e.key === 'ArrowLeft') prev();
+});
+
+pan.addEventListener('wheel', (e) => {
+  if (!(e.ctrlKey ? true : e.metaKey)) return;
+  e.preventDefault();
+  const delta = e.deltaY;
+  const factor = delta > 0 ? 0.9 : 1.1;
+  zoom = clamp(zoom * factor, 1, 8);
+  onZoom();
+  recenter();
+}, { passive: false });
+
+// Pinch-to-zoom (mobile)
+let pinchActive = false;
+let pinchStartDist = 0;
+let pinchStartZoom = 1;
+function touchDist(t1, t2) {
+  const dx = t1.clientX - t2.clientX;
+  const dy = t1.clientY - t2.clientY;
+  return Math.hypot(dx, dy);
+}
+pan.addEventListener('touchstart', (e) => {
+  if (!e.touches || e.touches.length !== 2) return;
+  pinchActive = true;
+  pinchStartDist = touchDist(e.touches[0], e.touches[1]);
+  pinchStartZoom = zoom;
+}, { passive: true });
+pan.addEventListener('touchmove', (e) => {
+  if (!pinchActive || !e.touches || e.touches.length !== 2) return;
+  e.preventDefault();
+  const curDist = touchDist(e.touches[0], e.touches[1]);
+  if (pinchStartDist <= 0) return;
+  const ratio = curDist / pinchStartDist;
+  zoom = clamp(pinchStartZoom * ratio, 1, 8);
+  onZoom();
+}, { passive: false });
+pan.addEventListener('touchend', (e) => {
+  if (!pinchActive) return;
+  if (!e.touches || e.touches.length < 2) {
+    pinchActive = false;
+    recenter();
+  }
+}, { passive: true });
+pan.addEventListener('touchcancel', () => { pinchActive = false; }, { passive: true });
+
+function getMemoryGiB() {
+  const dm = Number(navigator.deviceMemory);
+  return Number.isFinite(dm) && dm > 0 ? dm : 4;
+}
+function getMaxCanvasPixels() {
+  const mem = getMemoryGiB();
+  if (mem >= 8) return 28_000_000;
+  if (mem >= 4) return 18_000_000;
+  return 12_000_000;
+}
+function isMemoryPressured() {
+  // Chromium exposes heap usage; back off when the tab is already heavy.
+  const mem = performance.memory;
+  return !!(mem && mem.jsHeapSizeLimit > 0 && mem.usedJSHeapSize / mem.jsHeapSizeLimit > 0.6);
+}
+function getPixelBudget() {
+  return getMaxCanvasPixels() * (isMemoryPressured() ? 0.7 : 1);
+}
+function getQualityScaleForCurrentView(viewport) {
+  // Match the device pixels the page occupies on screen, but never size a
+  // canvas past the pixel budget: the cap is applied last, so there is no
+  // oversized first allocation to fall back from. refineCanvas() keeps the
+  // live canvas, its scratch canvas and the bitmap cache within two budgets.
+  const dpr = window.devicePixelRatio || 1;
+  const wanted = clamp(dpr * baseScale * zoom, 1, 6);
+  const fit = Math.sqrt(getPixelBudget() / Math.max(1, viewport.width * viewport.height));
+  return Math.min(wanted, fit);
+}
+
+// Finished page rasters, least recently used first. Going back to a page
+// blits its bitmap instead of re-rendering it. Bounded by entry count and by
+// the same pixel budget as the live canvas, and emptied under memory pressure.
+const PAGE_CACHE_MAX = 6;
+const pageCache = new Map();
+function getCachedPage(num, maxScale) {
+  const hit = pageCache.get(num);
+  if (!hit || hit.maxScale !== maxScale) return null;
+  pageCache.delete(num);
+  pageCache.set(num, hit);
+  return hit;
+}
+// Close least recently used bitmaps until the cache holds at most maxPx pixels.
+function trimPageCache(maxPx) {
+  let px = 0;
+  for (const e of pageCache.values()) px += e.bitmap.width * e.bitmap.height;
+  for (const [k, e] of pageCache) {
+    if (px <= maxPx) break;
+    px -= e.bitmap.width * e.bitmap.height;
+    e.bitmap.close();
+    pageCache.delete(k);
+  }
+}
+function clearPageCache() {
+  for (const e of pageCache.values()) e.bitmap.close();
+  pageCache.clear();
+}
+function cachePage(num, maxScale, outputScale) {
+  if (typeof createImageBitmap !== 'function') return;
+  if (isMemoryPressured()) {
+    clearPageCache();
+    return;
+  }
+  createImageBitmap(canvas).then((bitmap) => {
+    pageCache.get(num)?.bitmap.close();
+    pageCache.delete(num);
+    pageCache.set(num, { bitmap, maxScale, outputScale });
+    const budget = getPixelBudget();
+    let px = 0;
+    for (const e of pageCache.values()) px += e.bitmap.width * e.bitmap.height;
+    for (const [k, e] of pageCache) {
+      if (k === num || (pageCache.size <= PAGE_CACHE_MAX && px <= budget)) break;
+      px -= e.bitmap.width * e.bitmap.height;
+      e.bitmap.close();
+      pageCache.delete(k);
+    }
+  }).catch(() => {});
+}
+
+function sizeCanvas(viewport, outputScale) {
+  canvas.width = Math.floor(viewport.width * outputScale);
+  canvas.height = Math.floor(viewport.height * outputScale);
+  canvas.style.width = `${viewport.width}px`;
+  canvas.style.height = `${viewport.height}px`;
+  stage.style.width = `${viewport.width}px`;
+  stage.style.height = `${viewport.height}px`;
+  return canvas.getContext('2d', { alpha: false });
+}
+
+function drawCachedPage(viewport, cached) {
+  try { renderTask?.cancel?.(); } catch (_) {}
+  const ctx = sizeCanvas(viewport, cached.outputScale);
+  ctx.drawImage(cached.bitmap, 0, 0);
+  setStatus('');
+}
+
+async function renderCanvas(page, viewport, outputScale, token, showStatus) {
+  if (token !== renderToken) return false;
+  if (showStatus) setStatus('Rendering…');
+  const ctx = sizeCanvas(viewport, outputScale);
+  const transform = outputScale !== 1 ? [outputScale, 0, 0, outputScale, 0, 0] : null;
+  try { renderTask?.cancel?.(); } catch (_) {}
+  renderTask = page.render({ canvasContext: ctx, viewport, transform });
+  await renderTask.promise;
+  if (token !== renderToken) return false;
+  if (showStatus) setStatus('');
+  return true;
+}
+
+// Render the sharper pass into a scratch canvas and copy it over #pdfCanvas
+// only once it has finished, so the page on screen never blanks and repaints
+// after a zoom or refine.
+async function refineCanvas(page, viewport, outputScale, token) {
+  if (token !== renderToken) return false;
+  const width = Math.floor(viewport.width * outputScale);
+  const height = Math.floor(viewport.height * outputScale);
+  // The scratch and live canvas coexist until the swap; make room for both
+  // by evicting cached bitmaps so the total stays within two budgets.
+  trimPageCache(Math.max(0, 2 * getPixelBudget() - canvas.width * canvas.height - width * height));
+  const scratch = document.createElement('canvas');
+  scratch.width = width;
+  scratch.height = height;
+  const transform = outputScale !== 1 ? [outputScale, 0, 0, outputScale, 0, 0] : null;
+  try { renderTask?.cancel?.(); } catch (_) {}
+  try {
+    renderTask = page.render({ canvasContext: scratch.getContext('2d', { alpha: false }), viewport, transform });
+    await renderTask.promise;
+    if (token !== renderToken) return false;
+    sizeCanvas(viewport, outputScale).drawImage(scratch, 0, 0);
+    return true;
+  } finally {
+    // Release the scratch backing store right away instead of waiting for GC.
+    scratch.width = scratch.height = 0;
+  }
+}
+
+async function renderTextLayer(container, textContent, viewport) {
+  await new pdfjsLib.TextLayer({ textContentSource: textContent, container, viewport }).render();
+}
+
+async function renderAnnotationLayer(div, annotations, page, viewport) {
+  // Forms are expensive; disable for faster load while keeping links.
+  const layer = new pdfjsLib.AnnotationLayer({
+    div, page, viewport,
+    accessibilityManager: null, annotationCanvasMap: null, annotationEditorUIManager: null, structTreeLayer: null,
+  });
+  await layer.render({ viewport, div, annotations, page, linkService, renderForms: false });
+}
+
+function detachedLayer(name) {
+  const div = document.createElement('div');
+  div.className = name;
+  div.id = name;
+  return div;
+}
+
+async function renderLayers(page, viewport, token) {
+  try {
+    textLayerDiv.replaceChildren();
+    annotationLayerDiv.replaceChildren();
+    // Text and annotations are independent worker requests; fetch and build
+    // them side by side.
+    const [textContent, annotations] = await Promise.all([
+      getTextContent(page),
+      page.getAnnotations({ intent: 'display' }),
+    ]);
+    if (token !== renderToken) return;
+    // Build the layers off-DOM and attach each in one go; appending to the
+    // live layer costs a style/layout pass per span on text-heavy pages.
+    const textLayer = detachedLayer('textLayer');
+    const annotationLayer = detachedLayer('annotationLayer');
+    const [text, annots] = await Promise.allSettled([
+      renderTextLayer(textLayer, textContent, viewport),
+      renderAnnotationLayer(annotationLayer, annotations, page, viewport),
+    ]);
+    if (token !== renderToken) return;
+    if (text.status === 'fulfilled') {
+      textLayerDiv.replaceWith(textLayer);
+      textLayerDiv = textLayer;
+    } else {
+      console.warn('Text layer render error', text.reason);
+    }
+    if (annots.status === 'fulfilled') {
+      annotationLayerDiv.replaceWith(annotationLayer);
+      annotationLayerDiv = annotationLayer;
+    } else {
+      console.warn('Annotation layer render error', annots.reason);
+    }
+  } catch (e) {
+    console.warn('Layer render error', e);
+  }
+}
+
+// Text content promises by page number, so a prefetched page's text
+// layer doesn't wait on another worker round trip.
+const TEXT_CACHE_MAX = 4;
+const textCache = new Map();
+function getTextContent(page) {
+  const num = page.pageNumber;
+  let pending = textCache.get(num);
+  if (!pending) {
+    pending = page.getTextContent({ includeMarkedContent: true });
+    pending.catch(() => textCache.delete(num));
+    textCache.set(num, pending);
+    if (textCache.size > TEXT_CACHE_MAX) textCache.delete(textCache.keys().next().value);
+  }
+  return pending;
+}
+
+const whenIdle = window.requestIdleCallback
+  ? (fn) => requestIdleCallback(fn, { timeout: 1000 })
+  : (fn) => setTimeout(fn, 200);
+
+function prefetchNeighbors(num) {
+  // Warm pdf.js' page cache so the next arrow press skips the worker round
+  // trip; for the next page also pull its text content ahead of time.
+  for (const n of [num + 1, num - 1]) {
+    if (n < 1 || n > pdfDoc.numPages) continue;
+    pdfDoc.getPage(n)
+      .then((page) => { if (n === num + 1) return getTextContent(page); })
+      .catch(() => {});
+  }
+}
+
+async function renderPage(requested) {
+  if (!pdfDoc) return;
+  renderToken++;
+  const token = renderToken;
+  const num = clamp(requested, 1, pdfDoc.numPages);
+  pageNumber = num;
+  setNavState();
+  zoom = 1;
+  const page = await pdfDoc.getPage(num);
+  // A newer call may have started (and even finished) while this page was
+  // fetched; don't let a stale call touch the timers, cache or canvas.
+  if (token !== renderToken) return;
+  const viewport = page.getViewport({ scale: 1 });
+  computeBaseScale(viewport.width, viewport.height);
+  applyScale();
+  recenter();
+  const maxScale = getQualityScaleForCurrentView(viewport);
+  if (refineTimer) clearTimeout(refineTimer);
+  if (zoomSettleTimer) clearTimeout(zoomSettleTimer);
+  refineTimer = zoomSettleTimer = null;
+  const cached = getCachedPage(num, maxScale);
+  if (cached) {
+    drawCachedPage(viewport, cached);
+    shown = { page, viewport, num, token, maxScale, scale: cached.outputScale };
+  } else {
+    const previewScale = Math.min(1.25, maxScale);
+    await renderCanvas(page, viewport, previewScale, token, true);
+    if (token !== renderToken) return;
+    shown = { page, viewport, num, token, maxScale, scale: previewScale };
+    if (maxScale > previewScale + 0.05) {
+      refineTimer = setTimeout(refineShown, 250);
+    } else {
+      cachePage(num, maxScale, previewScale);
+    }
+  }
+  setTimeout(() => renderLayers(page, viewport, token), 0);
+  whenIdle(() => prefetchNeighbors(num));
+}
+
+async function loadPdf() {
+  setStatus('Loading…');
+  // pdf.js probes range support on its first request and falls back to a
+  // full download on its own, so no separate HEAD round trip is needed.
+  const loadingTask = pdfjsLib.getDocument({ url: PDF_URL });
+  loadingTask.onProgress = (p) => {
+    if (!p || !p.loaded) return;
+    if (p.total) setStatus(`Loading… ${Math.round((p.loaded/p.total)*100)}%`);
+  };
+  const timeout = setTimeout(() => setError('Loading timed out.'), 60000);
+  try {
+    pdfDoc = await loadingTask.promise;
+    linkService.setDocument(pdfDoc);
+    clearTimeout(timeout);
+    setStatus('');
+    setNavState();
+    await renderPage(1);
+  } catch (err) {
+    clearTimeout(timeout);
+    setError('Failed to load PDF.', err);
+  }
+}
+
+pdfjsLib.GlobalWorkerOptions.workerSrc = './pdfjs/pdf.worker.min.mjs';
+
+// index.html passes the per-build values; everything else is static.
+export function startViewer({ url, pages }) {
+  PDF_URL = url;
+  PDF_PAGES = pages;
+  loadPdf();
+}